@@ -1,57 +1,117 @@
 # backend/auth.py
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Request, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from passlib.context import CryptContext
-from psycopg2 import pool
-import jwt
-from datetime import datetime, timedelta
+import asyncio
+import asyncpg
 from pydantic import BaseModel, validator
+from cachetools import TLRUCache
+import hashlib
 import logging
 import re
-from config import settings
+import threading
+import time
+from backend.jwt_utils import HMACSigner, JWTError, ExpiredSignatureError
+from backend.passwords import hash_password, verify_and_update_password
+from config import settings, JWT_KEY, JWT_ALG, ACCESS_TTL
 
 # Logging setup
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# PostgreSQL connection pool with secure configuration
-try:
-    db_pool = pool.SimpleConnectionPool(
-        minconn=1,
-        maxconn=5,
-        user=settings.db_user,
-        password=settings.db_password,
-        host=settings.db_host,
-        port=settings.db_port,
-        database=settings.db_name
-    )
-    logger.info("Database connection pool initialized successfully")
-except Exception as e:
-    logger.error(f"Database connection pool initialization failed: {e}")
-    raise
-
-# Password hashing with secure configuration
-pwd_context = CryptContext(
-    schemes=["bcrypt"], 
-    deprecated="auto",
-    bcrypt__rounds=12  # Increased rounds for better security
+# JWT signing/verification; the keyed HMAC is set up once at import
+token_signer = HMACSigner(JWT_KEY, JWT_ALG)
+
+# SQL used on the auth hot path. asyncpg prepares each statement server-side
+# on first use and caches it per connection, keyed by the exact query text,
+# so these are kept as constants to guarantee cache hits.
+PING_SQL = "SELECT 1"
+# created_at is filled in by the column default (CURRENT_TIMESTAMP)
+INSERT_USER_SQL = (
+    "INSERT INTO users (username, password) VALUES ($1, $2) "
+    "ON CONFLICT (username) DO NOTHING RETURNING id"
 )
+GET_USER_SQL = "SELECT id, username, password FROM users WHERE username = $1"
+UPDATE_PASSWORD_SQL = "UPDATE users SET password = $1 WHERE id = $2"
 
-def get_db_connection():
-    connection = db_pool.getconn()
-    if not connection:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
-            detail="Database connection error"
+# PostgreSQL connection pool with secure configuration.
+# Created in the application lifespan and stored on app.state.db_pool.
+async def create_db_pool() -> asyncpg.Pool:
+    try:
+        db_pool = await asyncpg.create_pool(
+            min_size=settings.db_pool_min,
+            max_size=settings.db_pool_max,
+            statement_cache_size=settings.db_statement_cache_size,
+            user=settings.db_user,
+            password=settings.db_password,
+            host=settings.db_host,
+            port=settings.db_port,
+            database=settings.db_name
         )
+        logger.info("Database connection pool initialized successfully")
+        return db_pool
+    except Exception as e:
+        logger.error("Database connection pool initialization failed: %s", e)
+        raise
+
+# Upper bound for the checkout ping, so a half-open TCP connection is
+# detected instead of hanging the request
+DB_PING_TIMEOUT = 2  # seconds
+
+async def _discard_connection(db_pool: asyncpg.Pool, connection: asyncpg.Connection):
+    # terminate() closes without a graceful handshake, which could itself hang,
+    # and hands the slot back to the pool; the next acquire() reconnects it
+    connection.terminate()
+    await db_pool.release(connection)
+
+async def _acquire_live_connection(db_pool: asyncpg.Pool) -> asyncpg.Connection:
+    """Acquire a connection, replacing it once if it was dropped while idle"""
+    connection = await db_pool.acquire()
+    try:
+        await connection.execute(PING_SQL, timeout=DB_PING_TIMEOUT)
+    except (asyncpg.PostgresConnectionError, asyncpg.InterfaceError, OSError, asyncio.TimeoutError):
+        logger.warning("Discarding dead database connection")
+        await _discard_connection(db_pool, connection)
+        return await db_pool.acquire()
+    except BaseException:
+        # Anything else (server shutdown, cancellation, ...) must not leak the slot
+        await _discard_connection(db_pool, connection)
+        raise
+    return connection
+
+async def get_db_connection(request: Request):
+    db_pool = request.app.state.db_pool
+    connection = await _acquire_live_connection(db_pool)
     try:
         yield connection
     finally:
-        db_pool.putconn(connection)
+        await db_pool.release(connection)
 
 # OAuth2 setup
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
+# Short-lived cache of verified tokens, keyed by sha256(token).
+# Entries live for at most JWT_CACHE_TTL seconds and never past the token's
+# own exp, which keeps the window for a revoked/rotated key small.
+JWT_CACHE_TTL = 5
+
+def _jwt_cache_ttu(key, value, now):
+    return min(now + JWT_CACHE_TTL, value["exp"])
+
+_jwt_cache = TLRUCache(maxsize=10_000, ttu=_jwt_cache_ttu, timer=time.time)
+_jwt_cache_lock = threading.Lock()
+
+# Validation patterns, compiled once at import
+_USERNAME_RE = re.compile(r'^[a-zA-Z0-9_]+$')
+
+# Byte -> character class table for single-pass password checks
+_UPPER, _LOWER, _DIGIT = 1, 2, 4
+_CHAR_CLASS = bytes(
+    (_UPPER if 65 <= i <= 90 else 0)
+    | (_LOWER if 97 <= i <= 122 else 0)
+    | (_DIGIT if 48 <= i <= 57 else 0)
+    for i in range(256)
+)
+
 # Secure Models with validation
 class User(BaseModel):
     username: str
@@ -63,7 +123,7 @@ class User(BaseModel):
             raise ValueError('Username must be at least 3 characters long')
         if len(v) > 50:
             raise ValueError('Username must be less than 50 characters')
-        if not re.match(r'^[a-zA-Z0-9_]+$', v):
+        if not _USERNAME_RE.match(v):
             raise ValueError('Username can only contain letters, numbers, and underscores')
         return v.lower()  # Store usernames in lowercase
     
@@ -73,12 +133,15 @@ class User(BaseModel):
             raise ValueError('Password must be at least 8 characters long')
         if len(v) > 128:
             raise ValueError('Password must be less than 128 characters')
-        # Check for at least one uppercase, one lowercase, one digit
-        if not re.search(r'[A-Z]', v):
+        # Check for at least one uppercase, one lowercase, one digit.
+        # translate() classifies every byte in one C-level pass; non-ASCII
+        # bytes map to 0, so only ASCII letters and digits count.
+        classes = set(v.encode().translate(_CHAR_CLASS))
+        if _UPPER not in classes:
             raise ValueError('Password must contain at least one uppercase letter')
-        if not re.search(r'[a-z]', v):
+        if _LOWER not in classes:
             raise ValueError('Password must contain at least one lowercase letter')
-        if not re.search(r'\d', v):
+        if _DIGIT not in classes:
             raise ValueError('Password must contain at least one digit')
         return v
 
@@ -95,37 +158,26 @@ auth_router = APIRouter()
 
 # Create user endpoint with better security
 @auth_router.post("/signup", response_model=UserResponse)
-def signup(user: User, db=Depends(get_db_connection)):
-    hashed_password = pwd_context.hash(user.password)
-    
+async def signup(user: User, db=Depends(get_db_connection)):
     try:
-        with db.cursor() as cursor:
-            # Check if user already exists
-            cursor.execute(
-                "SELECT username FROM users WHERE username = %s",
-                (user.username,)
-            )
-            if cursor.fetchone():
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST, 
-                    detail="Username already exists"
-                )
-            
-            # Insert new user
-            cursor.execute(
-                "INSERT INTO users (username, password, created_at) VALUES (%s, %s, %s)",
-                (user.username, hashed_password, datetime.utcnow()),
+        # Password hashing is CPU-bound by design; it runs in the hashing process pool
+        hashed_password = await hash_password(user.password)
+        
+        # Insert new user; no row comes back if the username is already taken
+        user_id = await db.fetchval(INSERT_USER_SQL, user.username, hashed_password)
+        if user_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, 
+                detail="Username already exists"
             )
-            db.commit()
             
-        logger.info(f"New user created: {user.username}")
+        logger.info("New user created: %s", user.username)
         return UserResponse(username=user.username, message="User created successfully")
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error during signup for user {user.username}: {e}")
-        db.rollback()
+        logger.error("Error during signup for user %s: %s", user.username, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
             detail="Internal server error during signup"
@@ -134,44 +186,48 @@ def signup(user: User, db=Depends(get_db_connection)):
 # Generate JWT token with secure configuration
 def create_access_token(data: dict):
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=settings.access_token_expire_minutes)
+    now = int(time.time())
     to_encode.update({
-        "exp": expire,
-        "iat": datetime.utcnow(),  # Issued at time
+        "exp": now + ACCESS_TTL,
+        "iat": now,  # Issued at time
         "type": "access"  # Token type
     })
-    return jwt.encode(to_encode, settings.jwt_secret_key, algorithm=settings.jwt_algorithm)
+    return token_signer.encode(to_encode)
 
 # Token endpoint with better error handling
 @auth_router.post("/token", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db=Depends(get_db_connection)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db=Depends(get_db_connection)):
     try:
-        with db.cursor() as cursor:
-            cursor.execute(
-                "SELECT id, username, password FROM users WHERE username = %s",
-                (form_data.username.lower(),),
-            )
-            user = cursor.fetchone()
+        user = await db.fetchrow(GET_USER_SQL, form_data.username.lower())
         
         # Verify user exists and password is correct
-        if not user or not pwd_context.verify(form_data.password, user[2]):
-            logger.warning(f"Failed login attempt for username: {form_data.username}")
+        if user:
+            valid, new_hash = await verify_and_update_password(form_data.password, user[2])
+        else:
+            valid, new_hash = False, None
+        
+        if not valid:
+            logger.warning("Failed login attempt for username: %s", form_data.username)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid username or password",
                 headers={"WWW-Authenticate": "Bearer"},
             )
         
+        # Transparently migrate legacy bcrypt hashes to argon2id
+        if new_hash:
+            await db.execute(UPDATE_PASSWORD_SQL, new_hash, user[0])
+        
         # Create access token
         access_token = create_access_token(data={"sub": user[1], "user_id": user[0]})
-        logger.info(f"Successful login for user: {user[1]}")
+        logger.info("Successful login for user: %s", user[1])
         
         return Token(access_token=access_token, token_type="bearer")
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error during login for user {form_data.username}: {e}")
+        logger.error("Error during login for user %s: %s", form_data.username, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
             detail="Internal server error during login"
@@ -185,24 +241,35 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
         headers={"WWW-Authenticate": "Bearer"},
     )
     
+    cache_key = hashlib.sha256(token.encode()).digest()
+    with _jwt_cache_lock:
+        cached = _jwt_cache.get(cache_key)
+    if cached is not None:
+        return {"username": cached["username"], "user_id": cached["user_id"]}
+    
     try:
-        payload = jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
+        payload = token_signer.decode(token)
         username: str = payload.get("sub")
         user_id: int = payload.get("user_id")
         token_type: str = payload.get("type")
         
         if username is None or user_id is None or token_type != "access":
             raise credentials_exception
+        
+        # Only tokens that passed full validation are cached
+        if "exp" in payload:
+            with _jwt_cache_lock:
+                _jwt_cache[cache_key] = {"username": username, "user_id": user_id, "exp": payload["exp"]}
             
         return {"username": username, "user_id": user_id}
         
-    except jwt.ExpiredSignatureError:
+    except ExpiredSignatureError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token has expired",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    except jwt.PyJWTError:
+    except JWTError:
         raise credentials_exception
 
 # Protected endpoint example
@@ -3,8 +3,13 @@ import google.generativeai as genai
 from google.api_core.exceptions import ResourceExhausted, GoogleAPIError
 import logging
 from config import settings
-from pydantic import BaseModel, validator
-from typing import Literal
+from pydantic import BaseModel, StringConstraints
+from cachetools import TTLCache
+from typing import Annotated, AsyncIterator, Literal
+from collections import OrderedDict, deque
+from types import MappingProxyType
+import hashlib
+import threading
 import time
 
 # Configure logging
@@ -16,7 +21,7 @@ try:
     model = genai.GenerativeModel("models/gemini-1.5-pro")
     logger.info("Gemini AI model initialized successfully")
 except Exception as e:
-    logger.error(f"Failed to initialize Gemini AI: {e}")
+    logger.error("Failed to initialize Gemini AI: %s", e)
     raise
 
 # Input validation models
@@ -27,112 +32,218 @@ class PostGenerationRequest(BaseModel):
     ]
     length: Literal["short", "medium", "long"]
     language: Literal["english", "spanish", "french", "german", "italian", "portuguese"]
-    topic: str = ""
-    
-    @validator('topic')
-    def validate_topic(cls, v):
-        if len(v) > 200:
-            raise ValueError('Topic must be less than 200 characters')
-        return v.strip()
+    # Stripped and length-checked inside pydantic-core while parsing
+    topic: Annotated[str, StringConstraints(strip_whitespace=True, max_length=200)] = ""
 
-# Rate limiting (simple in-memory implementation)
+# Rate limiting (simple in-memory implementation, per worker process).
+# Each user keeps a bounded deque of request timestamps, oldest first, and
+# users are kept in LRU order so idle ones are evicted once max_users is hit.
+# A multi-worker deployment would need a shared store (e.g. Redis INCR/EXPIRE).
 class RateLimiter:
-    def __init__(self):
-        self.requests = {}
+    def __init__(self, max_users: int = 100_000):
+        self.requests: "OrderedDict[int, deque]" = OrderedDict()
+        self.max_users = max_users
+        self._lock = threading.Lock()
     
     def is_allowed(self, user_id: int, max_requests: int = 10, window_minutes: int = 60) -> bool:
         current_time = time.time()
         window_start = current_time - (window_minutes * 60)
         
-        if user_id not in self.requests:
-            self.requests[user_id] = []
-        
-        # Remove old requests outside the window
-        self.requests[user_id] = [req_time for req_time in self.requests[user_id] if req_time > window_start]
-        
-        # Check if under the limit
-        if len(self.requests[user_id]) < max_requests:
-            self.requests[user_id].append(current_time)
-            return True
+        with self._lock:
+            user_requests = self.requests.get(user_id)
+            if user_requests is None:
+                user_requests = self.requests[user_id] = deque(maxlen=max_requests)
+                if len(self.requests) > self.max_users:
+                    self.requests.popitem(last=False)
+            else:
+                self.requests.move_to_end(user_id)
+            
+            # Remove old requests outside the window
+            while user_requests and user_requests[0] <= window_start:
+                user_requests.popleft()
+            
+            # Check if under the limit
+            if len(user_requests) < max_requests:
+                user_requests.append(current_time)
+                return True
+            
+            return False
+    
+    def recent_requests(self, user_id: int, window_minutes: int = 60) -> int:
+        """Number of requests the user made inside the window"""
+        window_start = time.time() - (window_minutes * 60)
         
-        return False
+        with self._lock:
+            user_requests = self.requests.get(user_id, ())
+            return sum(1 for req_time in user_requests if req_time > window_start)
 
 # Global rate limiter instance
 rate_limiter = RateLimiter()
 
-def generate_linkedin_post(request: PostGenerationRequest, user_id: int) -> dict:
-    """
-    Generate a LinkedIn post using Google's Gemini AI with proper error handling and rate limiting.
+def _rate_limit_error(user_id: int):
+    """Return the rate limit error result if the user is over the limit, else None"""
+    if rate_limiter.is_allowed(user_id):
+        return None
     
-    Args:
-        request: PostGenerationRequest containing mood, length, language, and optional topic
-        user_id: ID of the user making the request (for rate limiting)
+    logger.warning("Rate limit exceeded for user %s", user_id)
+    return {
+        "success": False,
+        "error": "Rate limit exceeded. Please try again later.",
+        "error_type": "rate_limit"
+    }
+
+# Prompt building blocks and generation settings, built once at import
+LENGTH_MAPPING = MappingProxyType({
+    "short": "1-2 sentences (maximum 280 characters)",
+    "medium": "2-4 sentences (maximum 500 characters)", 
+    "long": "4-6 sentences (maximum 800 characters)"
+})
+
+MOOD_INSTRUCTIONS = MappingProxyType({
+    "professional": "Use formal language, industry insights, and business-focused content",
+    "casual": "Use conversational tone, relatable examples, and friendly language",
+    "inspirational": "Focus on motivation, personal growth, and positive messages",
+    "humorous": "Include light humor, witty observations, but keep it professional",
+    "thought-provoking": "Ask questions, share insights, encourage discussion",
+    "celebratory": "Acknowledge achievements, milestones, or positive news",
+    "motivational": "Encourage action, share success stories, inspire others"
+})
+
+_PROMPT_HEADER = """
+    Create a LinkedIn post with the following specifications:
     
-    Returns:
-        dict: Contains either the generated post or error information
+    - Mood/Tone: {mood}
+    - Length: {length}
+    - Language: {language}
     """
+
+_PROMPT_TOPIC = "- Topic/Focus: {topic}\n"
+
+_PROMPT_REQUIREMENTS = """
+    Requirements:
+    - Make it engaging and likely to generate meaningful engagement
+    - Include relevant hashtags (2-5 maximum)
+    - Ensure it's appropriate for a professional network
+    - Make it authentic and valuable to the reader
+    - Do not include any promotional content or sales pitches
+    - Format it properly for LinkedIn (use line breaks where appropriate)
     
-    # Check rate limiting
-    if not rate_limiter.is_allowed(user_id):
-        logger.warning(f"Rate limit exceeded for user {user_id}")
+    Generate only the post content, no additional explanations.
+    """
+
+GENERATION_CONFIG = genai.types.GenerationConfig(
+    temperature=0.7,  # Balance creativity with consistency
+    top_p=0.8,
+    top_k=40,
+    max_output_tokens=1000,
+)
+
+# Cache of generated posts for identical requests (per worker process).
+# Keyed by a hash of the normalized request so repeats skip the Gemini call.
+POST_CACHE_TTL = 3600  # seconds
+_post_cache = TTLCache(maxsize=1024, ttl=POST_CACHE_TTL)
+_post_cache_stats = {"hits": 0, "misses": 0}
+
+def _post_cache_key(request: PostGenerationRequest) -> str:
+    key = f"{request.mood}|{request.length}|{request.language}|{request.topic.strip().lower()}"
+    return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+def get_post_cache_stats() -> dict:
+    """Get hit/miss counters for the generated post cache"""
+    return {
+        "hits": _post_cache_stats["hits"],
+        "misses": _post_cache_stats["misses"],
+        "size": len(_post_cache)
+    }
+
+def _post_result(request: PostGenerationRequest, generated_post: str) -> dict:
+    return {
+        "success": True,
+        "post": generated_post,
+        "metadata": {
+            "mood": request.mood,
+            "length": request.length,
+            "language": request.language,
+            "character_count": len(generated_post)
+        }
+    }
+
+def _build_prompt(request: PostGenerationRequest) -> str:
+    """Build the enhanced Gemini prompt for a post generation request"""
+    header = _PROMPT_HEADER.format(
+        mood=MOOD_INSTRUCTIONS[request.mood],
+        length=LENGTH_MAPPING[request.length],
+        language=request.language.title()
+    )
+    
+    if request.topic:
+        return "".join((header, _PROMPT_TOPIC.format(topic=request.topic), _PROMPT_REQUIREMENTS))
+    return header + _PROMPT_REQUIREMENTS
+
+def _generation_error(e: Exception, user_id: int) -> dict:
+    """Map an exception raised while calling Gemini to an error result"""
+    if isinstance(e, ResourceExhausted):
+        logger.error("Gemini API quota exceeded")
         return {
             "success": False,
-            "error": "Rate limit exceeded. Please try again later.",
-            "error_type": "rate_limit"
+            "error": "AI service quota exceeded. Please try again later.",
+            "error_type": "quota_exceeded"
         }
     
-    # Build enhanced prompt
-    length_mapping = {
-        "short": "1-2 sentences (maximum 280 characters)",
-        "medium": "2-4 sentences (maximum 500 characters)", 
-        "long": "4-6 sentences (maximum 800 characters)"
-    }
+    if isinstance(e, GoogleAPIError):
+        logger.error("Google API error: %s", e)
+        return {
+            "success": False,
+            "error": "AI service temporarily unavailable. Please try again later.",
+            "error_type": "api_error"
+        }
     
-    mood_instructions = {
-        "professional": "Use formal language, industry insights, and business-focused content",
-        "casual": "Use conversational tone, relatable examples, and friendly language",
-        "inspirational": "Focus on motivation, personal growth, and positive messages",
-        "humorous": "Include light humor, witty observations, but keep it professional",
-        "thought-provoking": "Ask questions, share insights, encourage discussion",
-        "celebratory": "Acknowledge achievements, milestones, or positive news",
-        "motivational": "Encourage action, share success stories, inspire others"
+    logger.error("Unexpected error during post generation for user %s: %s", user_id, e)
+    return {
+        "success": False,
+        "error": "An unexpected error occurred. Please try again.",
+        "error_type": "unexpected_error"
     }
+
+async def generate_linkedin_post(request: PostGenerationRequest, user_id: int, use_cache: bool = True) -> dict:
+    """
+    Generate a LinkedIn post using Google's Gemini AI with proper error handling and rate limiting.
     
-    base_prompt = f"""
-    Create a LinkedIn post with the following specifications:
+    Args:
+        request: PostGenerationRequest containing mood, length, language, and optional topic
+        user_id: ID of the user making the request (for rate limiting)
+        use_cache: Serve an earlier post for an identical request when available
     
-    - Mood/Tone: {mood_instructions.get(request.mood, request.mood)}
-    - Length: {length_mapping.get(request.length, request.length)}
-    - Language: {request.language.title()}
+    Returns:
+        dict: Contains either the generated post or error information
     """
     
-    if request.topic:
-        base_prompt += f"- Topic/Focus: {request.topic}\n"
+    # Check rate limiting
+    rate_limit_error = _rate_limit_error(user_id)
+    if rate_limit_error:
+        return rate_limit_error
     
-    base_prompt += """
-    Requirements:
-    - Make it engaging and likely to generate meaningful engagement
-    - Include relevant hashtags (2-5 maximum)
-    - Ensure it's appropriate for a professional network
-    - Make it authentic and valuable to the reader
-    - Do not include any promotional content or sales pitches
-    - Format it properly for LinkedIn (use line breaks where appropriate)
+    cache_key = _post_cache_key(request)
+    if use_cache:
+        cached_post = _post_cache.get(cache_key)
+        if cached_post is not None:
+            _post_cache_stats["hits"] += 1
+            logger.info(
+                "Serving cached post for user %s (cache hits=%d, misses=%d)",
+                user_id, _post_cache_stats["hits"], _post_cache_stats["misses"]
+            )
+            return _post_result(request, cached_post)
+        _post_cache_stats["misses"] += 1
     
-    Generate only the post content, no additional explanations.
-    """
+    base_prompt = _build_prompt(request)
     
     try:
-        logger.info(f"Generating post for user {user_id} with mood: {request.mood}, length: {request.length}")
+        logger.info("Generating post for user %s with mood: %s, length: %s", user_id, request.mood, request.length)
         
-        # Generate content with timeout
-        response = model.generate_content(
+        # Generate content without holding a worker thread while Gemini responds
+        response = await model.generate_content_async(
             base_prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.7,  # Balance creativity with consistency
-                top_p=0.8,
-                top_k=40,
-                max_output_tokens=1000,
-            )
+            generation_config=GENERATION_CONFIG
         )
         
         if not response or not response.text:
@@ -154,52 +265,69 @@ def generate_linkedin_post(request: PostGenerationRequest, user_id: int) -> dict
                 "error_type": "content_too_short"
             }
         
-        logger.info(f"Successfully generated post for user {user_id}")
-        return {
-            "success": True,
-            "post": generated_post,
-            "metadata": {
-                "mood": request.mood,
-                "length": request.length,
-                "language": request.language,
-                "character_count": len(generated_post)
-            }
-        }
+        logger.info("Successfully generated post for user %s", user_id)
+        # A fresh generation always refreshes the cache, even with use_cache off
+        _post_cache[cache_key] = generated_post
+        return _post_result(request, generated_post)
         
-    except ResourceExhausted:
-        logger.error("Gemini API quota exceeded")
-        return {
-            "success": False,
-            "error": "AI service quota exceeded. Please try again later.",
-            "error_type": "quota_exceeded"
-        }
+    except Exception as e:
+        return _generation_error(e, user_id)
+
+async def _iter_post_chunks(response, user_id: int) -> AsyncIterator[str]:
+    try:
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+        logger.info("Successfully streamed post for user %s", user_id)
+    except Exception as e:
+        # Headers are already sent at this point, so the stream just ends early
+        logger.error("Post stream interrupted for user %s: %s", user_id, e)
+
+async def stream_linkedin_post(request: PostGenerationRequest, user_id: int) -> dict:
+    """
+    Start streaming a LinkedIn post from Gemini as it is generated.
     
-    except GoogleAPIError as e:
-        logger.error(f"Google API error: {e}")
-        return {
-            "success": False,
-            "error": "AI service temporarily unavailable. Please try again later.",
-            "error_type": "api_error"
-        }
+    Rate limiting and the first Gemini round-trip happen before this returns,
+    so quota and API errors can still be reported with a proper status code.
+    
+    Args:
+        request: PostGenerationRequest containing mood, length, language, and optional topic
+        user_id: ID of the user making the request (for rate limiting)
+    
+    Returns:
+        dict: On success, "stream" holds an async iterator of text chunks;
+        otherwise the same error information as generate_linkedin_post
+    """
     
+    # Check rate limiting
+    rate_limit_error = _rate_limit_error(user_id)
+    if rate_limit_error:
+        return rate_limit_error
+    
+    base_prompt = _build_prompt(request)
+    
+    try:
+        logger.info("Streaming post for user %s with mood: %s, length: %s", user_id, request.mood, request.length)
+        
+        response = await model.generate_content_async(
+            base_prompt,
+            generation_config=GENERATION_CONFIG,
+            stream=True
+        )
     except Exception as e:
-        logger.error(f"Unexpected error during post generation for user {user_id}: {e}")
-        return {
-            "success": False,
-            "error": "An unexpected error occurred. Please try again.",
-            "error_type": "unexpected_error"
-        }
+        return _generation_error(e, user_id)
+    
+    return {
+        "success": True,
+        "stream": _iter_post_chunks(response, user_id)
+    }
 
 def get_generation_stats(user_id: int) -> dict:
     """Get rate limiting stats for a user"""
-    current_time = time.time()
-    window_start = current_time - (60 * 60)  # 1 hour window
-    
-    user_requests = rate_limiter.requests.get(user_id, [])
-    recent_requests = [req for req in user_requests if req > window_start]
+    recent_requests = rate_limiter.recent_requests(user_id, window_minutes=60)  # 1 hour window
     
     return {
-        "requests_in_last_hour": len(recent_requests),
+        "requests_in_last_hour": recent_requests,
         "max_requests_per_hour": 10,
-        "remaining_requests": max(0, 10 - len(recent_requests))
+        "remaining_requests": max(0, 10 - recent_requests)
     }
\ No newline at end of file
@@ -0,0 +1,102 @@
+# backend/jwt_utils.py
+import base64
+import hashlib
+import hmac
+import json
+import time
+
+import orjson
+
+class JWTError(Exception):
+    """Raised when a token is malformed or fails verification"""
+
+class ExpiredSignatureError(JWTError):
+    """Raised when a token's exp claim is in the past"""
+
+# Supported HMAC algorithms and the hashlib constructors backing them.
+# hashlib is OpenSSL-backed, so SHA extensions are used where the CPU has them.
+_DIGESTS = {
+    "HS256": hashlib.sha256,
+    "HS384": hashlib.sha384,
+    "HS512": hashlib.sha512,
+}
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+def _b64decode(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+def _dumps(payload: dict) -> bytes:
+    data = orjson.dumps(payload)
+    if data.isascii():
+        return data
+    # orjson writes non-ASCII as raw UTF-8; escape it like PyJWT/python-jose
+    # so tokens stay byte-for-byte identical to theirs
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+class HMACSigner:
+    """
+    Encode and verify compact HMAC-signed JWTs (HS256/HS384/HS512).
+
+    The keyed HMAC state and the encoded header are built once; each token
+    only copies the HMAC state and hashes its own signing input.
+    """
+
+    def __init__(self, key, algorithm: str = "HS256"):
+        if algorithm not in _DIGESTS:
+            raise ValueError(f"Unsupported JWT algorithm: {algorithm}")
+        if isinstance(key, str):
+            key = key.encode()
+
+        self.algorithm = algorithm
+        self._mac = hmac.new(key, digestmod=_DIGESTS[algorithm])
+        self._header = _b64encode(orjson.dumps({"alg": algorithm, "typ": "JWT"}))
+
+    def _signature(self, signing_input: bytes) -> bytes:
+        mac = self._mac.copy()
+        mac.update(signing_input)
+        return mac.digest()
+
+    def encode(self, payload: dict) -> str:
+        signing_input = self._header + b"." + _b64encode(_dumps(payload))
+        return (signing_input + b"." + _b64encode(self._signature(signing_input))).decode()
+
+    def decode(self, token: str, leeway: int = 0) -> dict:
+        """Verify the signature and time claims of a token and return its payload"""
+        try:
+            signing_input, _, signature = token.encode("ascii").rpartition(b".")
+            header_segment, _, payload_segment = signing_input.partition(b".")
+            if not header_segment or not payload_segment or b"." in payload_segment:
+                raise JWTError("Wrong number of segments")
+
+            if not hmac.compare_digest(_b64decode(signature), self._signature(signing_input)):
+                raise JWTError("Signature verification failed")
+
+            header = orjson.loads(_b64decode(header_segment))
+            payload = orjson.loads(_b64decode(payload_segment))
+        except ValueError as e:
+            # Covers bad base64, bad JSON and non-ASCII tokens
+            raise JWTError(f"Invalid token: {e}") from e
+
+        if not isinstance(header, dict) or header.get("alg") != self.algorithm:
+            raise JWTError("The specified alg value is not allowed")
+        if not isinstance(payload, dict):
+            raise JWTError("Invalid payload")
+
+        now = time.time()
+        exp = payload.get("exp")
+        if exp is not None:
+            if not isinstance(exp, (int, float)):
+                raise JWTError("Expiration Time claim (exp) must be a number")
+            if exp <= now - leeway:
+                raise ExpiredSignatureError("Signature has expired")
+
+        nbf = payload.get("nbf")
+        if nbf is not None:
+            if not isinstance(nbf, (int, float)):
+                raise JWTError("Not Before claim (nbf) must be a number")
+            if nbf > now + leeway:
+                raise JWTError("The token is not yet valid (nbf)")
+
+        return payload
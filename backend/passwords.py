@@ -0,0 +1,104 @@
+# backend/passwords.py
+# Password hashing runs in a process pool: argon2/bcrypt are CPU-bound, so
+# threads in one interpreter cannot use more than a share of the cores.
+# Spawned workers import this module and also re-import the launching script
+# (as __mp_main__), so with `python main.py` each worker loads the whole app.
+# The workers are therefore started and warmed up front, off the event loop,
+# instead of lazily on the first hash.
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+logger = logging.getLogger(__name__)
+
+# Password hashing with secure configuration
+# argon2id is the default for new hashes; bcrypt is kept so existing hashes
+# still verify and get upgraded on the next successful login
+pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt"], 
+    deprecated="auto",
+    argon2__time_cost=3,
+    argon2__memory_cost=65536,  # 64 MiB
+    argon2__parallelism=2,
+    bcrypt__rounds=12  # Increased rounds for better security
+)
+
+_executor: Optional[ProcessPoolExecutor] = None
+_max_workers = 1
+_rebuild_lock = asyncio.Lock()
+
+# Module-level functions so they can be pickled into the worker processes
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+def _verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(password, hashed_password)
+
+def _noop():
+    pass
+
+def _new_executor(max_workers: int) -> ProcessPoolExecutor:
+    """
+    Create the pool and block until its workers are up.
+
+    Workers are launched inside submit() and pay their imports before the
+    first task, so one no-op per worker is run here rather than on a login.
+    Blocking; call it through asyncio.to_thread.
+    """
+    # spawn rather than fork: the server process already runs an event loop and threads
+    executor = ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context("spawn")
+    )
+    for future in [executor.submit(_noop) for _ in range(max_workers)]:
+        future.result()
+    return executor
+
+async def start_hashing_pool(max_workers: int):
+    """Start and warm up the worker processes used for hashing (called from the app lifespan)"""
+    global _executor, _max_workers
+    _max_workers = max_workers
+    _executor = await asyncio.to_thread(_new_executor, max_workers)
+    logger.info("Password hashing pool started with %s workers", max_workers)
+
+async def shutdown_hashing_pool():
+    global _executor
+    executor, _executor = _executor, None
+    if executor is not None:
+        await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+
+async def _run_in_pool(func, *args):
+    """
+    Run func in the hashing pool, rebuilding the pool once if it is broken.
+
+    A ProcessPoolExecutor is unusable for good once any worker dies (e.g. an
+    OOM kill), so without this every later call would fail until restart.
+    Without a started pool this falls back to the loop's default thread pool.
+    """
+    global _executor
+    loop = asyncio.get_running_loop()
+    executor = _executor
+    try:
+        return await loop.run_in_executor(executor, func, *args)
+    except BrokenProcessPool:
+        if executor is None:
+            raise
+        # Concurrent callers may hit the same broken pool; only replace it once
+        async with _rebuild_lock:
+            if _executor is executor:
+                logger.error("Password hashing pool broke; restarting it")
+                executor.shutdown(wait=False, cancel_futures=True)
+                _executor = await asyncio.to_thread(_new_executor, _max_workers)
+        return await loop.run_in_executor(_executor, func, *args)
+
+async def hash_password(password: str) -> str:
+    return await _run_in_pool(_hash, password)
+
+async def verify_and_update_password(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password; also returns a new hash when the stored one is outdated"""
+    return await _run_in_pool(_verify_and_update, password, hashed_password)
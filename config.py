@@ -1,12 +1,26 @@
 # config.py
 import os
-from typing import List
+import re
+from typing import FrozenSet, Iterable, Optional, Tuple
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Connection pool defaults follow the (cores * 2) + spindles rule of thumb,
+# split across uvicorn worker processes (WEB_CONCURRENCY). A bigger pool is
+# not a faster one: past this point Postgres spends its time switching
+# between backends instead of running queries.
+_CPU_COUNT = os.cpu_count() or 1
+_WORKERS = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+_DEFAULT_POOL_MAX = max(2, (_CPU_COUNT * 2 + 1) // _WORKERS)
+_DEFAULT_POOL_MIN = max(2, _CPU_COUNT // _WORKERS)  # Capped at db_pool_max below
+# Hashing processes share the cores the same way; each argon2 hash also
+# holds 64 MiB, so W workers x cores hashers would oversubscribe CPU and RAM
+_DEFAULT_HASH_WORKERS = max(1, _CPU_COUNT // _WORKERS)
+
 class Settings(BaseSettings):
     # Database settings
     db_user: str = os.getenv("DB_USER", "postgres")
@@ -14,17 +28,38 @@ class Settings(BaseSettings):
     db_host: str = os.getenv("DB_HOST", "localhost")
     db_port: str = os.getenv("DB_PORT", "5432")
     db_name: str = os.getenv("DB_NAME", "postgenerator")
+    db_pool_min: Optional[int] = int(os.environ["DB_POOL_MIN"]) if os.getenv("DB_POOL_MIN") else None
+    db_pool_max: int = int(os.getenv("DB_POOL_MAX", str(_DEFAULT_POOL_MAX)))
+    # Prepared statements cached per connection; set to 0 behind PgBouncer in
+    # transaction pooling mode, which cannot keep server-side statements
+    db_statement_cache_size: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
     
     # JWT settings
     jwt_secret_key: str = os.getenv("JWT_SECRET_KEY")
     jwt_algorithm: str = os.getenv("JWT_ALGORITHM", "HS256")
     access_token_expire_minutes: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
     
+    # Password hashing worker processes (per app process, split across WEB_CONCURRENCY)
+    password_hash_workers: int = int(os.getenv("PASSWORD_HASH_WORKERS", str(_DEFAULT_HASH_WORKERS)))
+    
+    # Largest accepted request body in bytes; every endpoint takes small JSON/form payloads
+    max_request_body_bytes: int = int(os.getenv("MAX_REQUEST_BODY_BYTES", "4096"))
+    
     # Google AI settings
     google_api_key: str = os.getenv("GOOGLE_API_KEY")
     
-    # CORS settings
-    allowed_origins: List[str] = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000").split(",")
+    # CORS and trusted host settings (comma-separated; "*" wildcards allowed).
+    # Kept as plain strings so pydantic-settings does not try to JSON-decode
+    # them; the parsed forms are the module-level constants below.
+    allowed_origins: str = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000")
+    allowed_hosts: str = os.getenv("ALLOWED_HOSTS", "localhost,127.0.0.1,*.yourdomain.com")
+    
+    @model_validator(mode="after")
+    def default_db_pool_min(self):
+        """Derive the pool minimum from the effective maximum unless set explicitly"""
+        if self.db_pool_min is None:
+            self.db_pool_min = min(self.db_pool_max, _DEFAULT_POOL_MIN)
+        return self
     
     def validate_required_settings(self):
         """Validate that all required settings are present"""
@@ -38,6 +73,12 @@ class Settings(BaseSettings):
         if missing:
             raise ValueError(f"Missing required environment variables: {', '.join(missing)}")
         
+        if not 1 <= self.db_pool_min <= self.db_pool_max:
+            raise ValueError("DB_POOL_MIN must be at least 1 and not greater than DB_POOL_MAX")
+        
+        if self.password_hash_workers < 1:
+            raise ValueError("PASSWORD_HASH_WORKERS must be at least 1")
+        
         # Validate JWT secret key strength
         if len(self.jwt_secret_key) < 32:
             raise ValueError("JWT_SECRET_KEY must be at least 32 characters long")
@@ -49,4 +90,41 @@ class Settings(BaseSettings):
 settings = Settings()
 
 # Validate settings on import
-settings.validate_required_settings()
\ No newline at end of file
+settings.validate_required_settings()
+
+# Hot-path JWT settings bound once as plain module constants
+JWT_KEY: bytes = settings.jwt_secret_key.encode()
+JWT_ALG: str = settings.jwt_algorithm
+ACCESS_TTL: int = settings.access_token_expire_minutes * 60  # seconds
+
+def _split_patterns(values: Iterable[str]) -> Tuple[FrozenSet[str], Tuple[str, ...]]:
+    """Split comma-separated patterns into exact matches and wildcard patterns"""
+    exact, wildcards = set(), []
+    for value in (v.strip() for v in values):
+        if not value:
+            continue
+        if "*" in value and value != "*":
+            wildcards.append(value)
+        else:
+            exact.add(value)
+    return frozenset(exact), tuple(wildcards)
+
+def _host_suffixes(patterns: Iterable[str]) -> Tuple[str, ...]:
+    """Turn "*.example.com" host patterns into ".example.com" suffixes"""
+    suffixes = []
+    for pattern in patterns:
+        if not pattern.startswith("*.") or "*" in pattern[1:]:
+            raise ValueError(f"Invalid ALLOWED_HOSTS pattern {pattern!r}: wildcards must look like '*.example.com'")
+        suffixes.append(pattern[1:])
+    return tuple(suffixes)
+
+def _origin_regex(patterns: Iterable[str]) -> Optional[str]:
+    """Turn "https://*.example.com" origin patterns into one regex for CORSMiddleware (matched with fullmatch)"""
+    return "|".join(re.escape(pattern).replace(r"\*", "[^/]+") for pattern in patterns) or None
+
+# Pre-split origin and host patterns so the common exact match is a set lookup
+# and only wildcard entries fall back to suffix/regex matching
+ALLOWED_ORIGINS, _wildcard_origins = _split_patterns(settings.allowed_origins.split(","))
+ALLOWED_ORIGIN_REGEX = _origin_regex(_wildcard_origins)
+ALLOWED_HOSTS, _wildcard_hosts = _split_patterns(settings.allowed_hosts.split(","))
+ALLOWED_HOST_SUFFIXES = _host_suffixes(_wildcard_hosts)
\ No newline at end of file
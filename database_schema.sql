@@ -1,6 +1,10 @@
 -- database_schema.sql
 -- Create the users table with proper constraints and indexes
 
+-- NOTE: signup relies on the UNIQUE constraint on username
+-- (INSERT ... ON CONFLICT (username) DO NOTHING). Databases created from an
+-- older schema without it need:
+--   ALTER TABLE users ADD CONSTRAINT users_username_key UNIQUE (username);
 CREATE TABLE IF NOT EXISTS users (
     id SERIAL PRIMARY KEY,
     username VARCHAR(50) UNIQUE NOT NULL,
@@ -3,15 +3,27 @@
 import secrets
 import string
 
+def _random_string(alphabet, length):
+    """Map bulk OS random bytes onto the alphabet without modulo bias"""
+    n = len(alphabet)
+    limit = 256 - (256 % n)  # Bytes at or above this would favour the first characters
+    chars = []
+    while len(chars) < length:
+        missing = length - len(chars)
+        # Over-fetch a little so a second read is rarely needed
+        raw = secrets.token_bytes(missing + missing // 2 + 1)
+        chars.extend(alphabet[b % n] for b in raw if b < limit)
+    return ''.join(chars[:length])
+
 def generate_secure_jwt_secret(length=64):
     """Generate a cryptographically secure random string for JWT secret"""
     alphabet = string.ascii_letters + string.digits + "!@#$%^&*"
-    return ''.join(secrets.choice(alphabet) for _ in range(length))
+    return _random_string(alphabet, length)
 
 def generate_secure_password(length=32):
     """Generate a secure database password"""
     alphabet = string.ascii_letters + string.digits
-    return ''.join(secrets.choice(alphabet) for _ in range(length))
+    return _random_string(alphabet, length)
 
 if __name__ == "__main__":
     print("🔐 Generating secure credentials for your application...\n")
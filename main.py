@@ -1,14 +1,19 @@
 # main.py
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer
 import logging
 from contextlib import asynccontextmanager
 
-from backend.gemini_utils import generate_linkedin_post, PostGenerationRequest, get_generation_stats
-from backend.auth import auth_router, get_current_user
-from config import settings
+from backend.gemini_utils import (
+    generate_linkedin_post, stream_linkedin_post, PostGenerationRequest, get_generation_stats,
+    get_post_cache_stats
+)
+from backend.auth import auth_router, get_current_user, create_db_pool
+from backend.middleware import HealthCheckMiddleware, MaxBodySizeMiddleware, TrustedHostMiddleware
+from backend.passwords import start_hashing_pool, shutdown_hashing_pool
+from config import settings, ALLOWED_ORIGINS, ALLOWED_ORIGIN_REGEX, ALLOWED_HOSTS, ALLOWED_HOST_SUFFIXES
 
 # Configure logging
 logging.basicConfig(
@@ -22,10 +27,15 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("Application starting up...")
-    logger.info(f"Allowed origins: {settings.allowed_origins}")
+    logger.info("Allowed origins: %s", settings.allowed_origins)
+    app.state.db_pool = await create_db_pool()
+    await start_hashing_pool(settings.password_hash_workers)
     yield
     # Shutdown
     logger.info("Application shutting down...")
+    logger.info("Post cache stats: %s", get_post_cache_stats())
+    await shutdown_hashing_pool()
+    await app.state.db_pool.close()
 
 # Create FastAPI app with security configurations
 app = FastAPI(
@@ -33,25 +43,34 @@ app = FastAPI(
     description="A secure API for generating LinkedIn posts using AI",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     docs_url="/docs" if settings.db_host == "localhost" else None,  # Hide docs in production
     redoc_url="/redoc" if settings.db_host == "localhost" else None
 )
 
 # Security middlewares
+# Oversized bodies are rejected before request parsing and validation
+app.add_middleware(MaxBodySizeMiddleware, max_body_size=settings.max_request_body_bytes)
+
 app.add_middleware(
     TrustedHostMiddleware, 
-    allowed_hosts=["localhost", "127.0.0.1", "*.yourdomain.com"]  # Adjust for your domain
+    allowed_hosts=ALLOWED_HOSTS,  # Set ALLOWED_HOSTS for your domain
+    allowed_host_suffixes=ALLOWED_HOST_SUFFIXES
 )
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=settings.allowed_origins,  # Specific origins only
+    allow_origins=ALLOWED_ORIGINS,  # Specific origins only
+    allow_origin_regex=ALLOWED_ORIGIN_REGEX,
     allow_credentials=True,
     allow_methods=["GET", "POST"],  # Specific methods only
     allow_headers=["Authorization", "Content-Type"],  # Specific headers only
     max_age=3600,  # Cache preflight requests for 1 hour
 )
 
+# Health check endpoint for monitoring, served ahead of the middlewares above
+app.add_middleware(HealthCheckMiddleware, path="/health")
+
 # Include authentication router
 app.include_router(auth_router, prefix="/auth", tags=["Authentication"])
 
@@ -68,44 +87,51 @@ def read_root():
         "endpoints": {
             "auth": "/auth",
             "generate": "/generate",
+            "generate_stream": "/generate/stream",
             "stats": "/stats"
         }
     }
 
+def raise_for_generation_error(result: dict, user_id: int):
+    """Translate a failed generation result into the matching HTTP error"""
+    # Log the error but don't expose internal details
+    logger.warning("Post generation failed for user %s: %s", user_id, result.get('error_type', 'unknown'))
+    
+    # Return appropriate HTTP status based on error type
+    if result.get("error_type") == "rate_limit":
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=result["error"]
+        )
+    elif result.get("error_type") == "quota_exceeded":
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=result["error"]
+        )
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=result["error"]
+        )
+
 @app.post("/generate")
-def generate_post(
+async def generate_post(
     request: PostGenerationRequest,
+    nocache: bool = False,
     current_user: dict = Depends(get_current_user)
 ):
     """
     Generate a LinkedIn post with AI.
+    Identical requests are served from cache; pass ?nocache=1 for a fresh post.
     Requires authentication.
     """
-    logger.info(f"Post generation request from user {current_user['username']}")
+    logger.info("Post generation request from user %s", current_user['username'])
     
     try:
-        result = generate_linkedin_post(request, current_user["user_id"])
+        result = await generate_linkedin_post(request, current_user["user_id"], use_cache=not nocache)
         
         if not result["success"]:
-            # Log the error but don't expose internal details
-            logger.warning(f"Post generation failed for user {current_user['user_id']}: {result.get('error_type', 'unknown')}")
-            
-            # Return appropriate HTTP status based on error type
-            if result.get("error_type") == "rate_limit":
-                raise HTTPException(
-                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    detail=result["error"]
-                )
-            elif result.get("error_type") == "quota_exceeded":
-                raise HTTPException(
-                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                    detail=result["error"]
-                )
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=result["error"]
-                )
+            raise_for_generation_error(result, current_user["user_id"])
         
         return {
             "success": True,
@@ -117,7 +143,35 @@ def generate_post(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error in generate_post endpoint: {e}")
+        logger.error("Unexpected error in generate_post endpoint: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An unexpected error occurred"
+        )
+
+@app.post("/generate/stream")
+async def generate_post_stream(
+    request: PostGenerationRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Generate a LinkedIn post with AI, streaming the text as it is produced.
+    Requires authentication.
+    """
+    logger.info("Streaming post generation request from user %s", current_user['username'])
+    
+    try:
+        result = await stream_linkedin_post(request, current_user["user_id"])
+        
+        if not result["success"]:
+            raise_for_generation_error(result, current_user["user_id"])
+        
+        return StreamingResponse(result["stream"], media_type="text/plain")
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Unexpected error in generate_post_stream endpoint: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An unexpected error occurred"
@@ -136,29 +190,21 @@ def get_user_stats(current_user: dict = Depends(get_current_user)):
             "stats": stats
         }
     except Exception as e:
-        logger.error(f"Error getting stats for user {current_user['user_id']}: {e}")
+        logger.error("Error getting stats for user %s: %s", current_user['user_id'], e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Could not retrieve statistics"
         )
 
-@app.get("/health")
-def health_check():
-    """Health check endpoint for monitoring"""
-    return {
-        "status": "healthy",
-        "timestamp": "2025-06-30T00:00:00Z"
-    }
-
 # Error handlers
 @app.exception_handler(404)
 async def not_found_handler(request, exc):
-    return {"error": "Not found", "status_code": 404}
+    return ORJSONResponse({"error": "Not found", "status_code": 404}, status_code=404)
 
 @app.exception_handler(500)
 async def internal_error_handler(request, exc):
-    logger.error(f"Internal server error: {exc}")
-    return {"error": "Internal server error", "status_code": 500}
+    logger.error("Internal server error: %s", exc)
+    return ORJSONResponse({"error": "Internal server error", "status_code": 500}, status_code=500)
 
 if __name__ == "__main__":
     import uvicorn
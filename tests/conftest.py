@@ -0,0 +1,10 @@
+# tests/conftest.py
+import os
+
+# config validates these on import; tests never reach the database or Gemini
+os.environ.setdefault("DB_PASSWORD", "test-password")
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret-key-that-is-at-least-32-characters")
+os.environ.setdefault("GOOGLE_API_KEY", "test-api-key")
+os.environ["ALLOWED_HOSTS"] = "localhost,*.example.com"
+os.environ["ALLOWED_ORIGINS"] = "http://localhost:3000,https://*.example.com"
+os.environ["MAX_REQUEST_BODY_BYTES"] = "4096"
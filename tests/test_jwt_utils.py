@@ -0,0 +1,195 @@
+# tests/test_jwt_utils.py
+import base64
+import hashlib
+import hmac
+
+import orjson
+import pytest
+
+from backend import jwt_utils
+from backend.jwt_utils import ExpiredSignatureError, HMACSigner, JWTError
+
+KEY = "test-secret-key-that-is-at-least-64-bytes-long-for-hs512-signing!"
+NOW = 1_700_000_000
+
+def b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def sign(header_segment: str, payload_segment: str, algorithm: str = "HS256") -> str:
+    """Build a token from raw segments with a valid signature"""
+    digest = {"HS256": hashlib.sha256, "HS384": hashlib.sha384, "HS512": hashlib.sha512}[algorithm]
+    signing_input = f"{header_segment}.{payload_segment}".encode()
+    signature = hmac.new(KEY.encode(), signing_input, digest).digest()
+    return f"{header_segment}.{payload_segment}.{b64(signature)}"
+
+def header(algorithm: str = "HS256") -> str:
+    return b64(orjson.dumps({"alg": algorithm, "typ": "JWT"}))
+
+@pytest.fixture
+def signer():
+    return HMACSigner(KEY)
+
+@pytest.fixture(autouse=True)
+def frozen_time(monkeypatch):
+    monkeypatch.setattr(jwt_utils.time, "time", lambda: NOW)
+
+def test_round_trip(signer):
+    payload = {"sub": "user@example.com", "exp": NOW + 60}
+    assert signer.decode(signer.encode(payload)) == payload
+
+def test_unsupported_algorithm():
+    with pytest.raises(ValueError):
+        HMACSigner(KEY, algorithm="none")
+
+@pytest.mark.parametrize("segment", [0, 1, 2])
+def test_tampered_segment(signer, segment):
+    parts = signer.encode({"sub": "user@example.com"}).split(".")
+    replacements = [
+        header("HS256").replace("J9", "J0"),
+        b64(orjson.dumps({"sub": "admin@example.com"})),
+        b64(b"\x00" * 32),
+    ]
+    parts[segment] = replacements[segment]
+    with pytest.raises(JWTError, match="Signature verification failed"):
+        signer.decode(".".join(parts))
+
+def test_wrong_key():
+    token = HMACSigner("another-key").encode({"sub": "user@example.com"})
+    with pytest.raises(JWTError, match="Signature verification failed"):
+        HMACSigner(KEY).decode(token)
+
+@pytest.mark.parametrize("algorithm", ["HS384", "HS512", "none"])
+def test_wrong_alg_header(signer, algorithm):
+    # Correctly signed with the HS256 key, but the header claims another alg
+    token = sign(header(algorithm), b64(orjson.dumps({"sub": "user@example.com"})))
+    with pytest.raises(JWTError, match="alg value is not allowed"):
+        signer.decode(token)
+
+def test_token_for_other_algorithm_rejected(signer):
+    token = HMACSigner(KEY, algorithm="HS512").encode({"sub": "user@example.com"})
+    with pytest.raises(JWTError):
+        signer.decode(token)
+
+def test_header_without_alg(signer):
+    token = sign(b64(orjson.dumps({"typ": "JWT"})), b64(orjson.dumps({"sub": "user@example.com"})))
+    with pytest.raises(JWTError, match="alg value is not allowed"):
+        signer.decode(token)
+
+@pytest.mark.parametrize("token", ["", "abc", "a.b", "..", "a..c", ".b.c", "a.b.c.d"])
+def test_wrong_number_of_segments(signer, token):
+    with pytest.raises(JWTError, match="Wrong number of segments"):
+        signer.decode(token)
+
+def test_extra_segment_on_valid_token(signer):
+    token = signer.encode({"sub": "user@example.com"})
+    with pytest.raises(JWTError):
+        signer.decode(token + ".extra")
+
+@pytest.mark.parametrize("token", [
+    "é.a.b",
+    "a.b.☃",
+    "eyJhbGciOiJIUzI1NiJ9.eyJ.a",
+    "a.b.c",
+])
+def test_malformed_input(signer, token):
+    with pytest.raises(JWTError):
+        signer.decode(token)
+
+@pytest.mark.parametrize("payload_segment", [
+    b64(b"not json"),
+    b64(b'{"sub": '),
+    "a",
+])
+def test_bad_payload_encoding(signer, payload_segment):
+    with pytest.raises(JWTError, match="Invalid token"):
+        signer.decode(sign(header(), payload_segment))
+
+def test_bad_header_json(signer):
+    with pytest.raises(JWTError, match="Invalid token"):
+        signer.decode(sign(b64(b"{alg"), b64(orjson.dumps({"sub": "user@example.com"}))))
+
+@pytest.mark.parametrize("payload", [[1, 2], "user@example.com", 42, None])
+def test_non_object_payload(signer, payload):
+    with pytest.raises(JWTError, match="Invalid payload"):
+        signer.decode(sign(header(), b64(orjson.dumps(payload))))
+
+@pytest.mark.parametrize("exp, leeway, expired", [
+    (NOW + 1, 0, False),
+    (NOW, 0, True),
+    (NOW - 1, 0, True),
+    (NOW + 0.5, 0, False),
+    (NOW - 4, 5, False),
+    (NOW - 5, 5, True),
+])
+def test_exp_boundary(signer, exp, leeway, expired):
+    token = signer.encode({"sub": "user@example.com", "exp": exp})
+    if expired:
+        with pytest.raises(ExpiredSignatureError):
+            signer.decode(token, leeway=leeway)
+    else:
+        assert signer.decode(token, leeway=leeway)["exp"] == exp
+
+@pytest.mark.parametrize("nbf, leeway, valid", [
+    (NOW, 0, True),
+    (NOW - 1, 0, True),
+    (NOW + 1, 0, False),
+    (NOW + 1, 1, True),
+    (NOW + 2, 1, False),
+])
+def test_nbf_boundary(signer, nbf, leeway, valid):
+    token = signer.encode({"sub": "user@example.com", "nbf": nbf})
+    if valid:
+        assert signer.decode(token, leeway=leeway)["nbf"] == nbf
+    else:
+        with pytest.raises(JWTError, match="not yet valid") as excinfo:
+            signer.decode(token, leeway=leeway)
+        assert not isinstance(excinfo.value, ExpiredSignatureError)
+
+@pytest.mark.parametrize("claim", ["exp", "nbf"])
+@pytest.mark.parametrize("value", ["1700000060", [NOW], {"t": NOW}])
+def test_non_numeric_time_claim(signer, claim, value):
+    token = signer.encode({"sub": "user@example.com", claim: value})
+    with pytest.raises(JWTError, match="must be a number") as excinfo:
+        signer.decode(token)
+    assert not isinstance(excinfo.value, ExpiredSignatureError)
+
+def test_missing_time_claims_allowed(signer):
+    assert signer.decode(signer.encode({"sub": "user@example.com"})) == {"sub": "user@example.com"}
+
+# Compatibility with PyJWT, which the signer must stay interchangeable with
+
+PYJWT_PAYLOADS = [
+    {"sub": "user@example.com", "exp": NOW + 1800},
+    {"sub": "user@example.com", "exp": NOW + 1800, "nbf": NOW - 10, "iat": NOW},
+    {"sub": "usér@exämple.com", "name": "漢字", "exp": NOW + 60.5},
+    {"sub": "user@example.com", "scopes": ["read", "write"], "meta": {"a": None, "b": True}},
+]
+
+@pytest.mark.parametrize("algorithm", ["HS256", "HS384", "HS512"])
+@pytest.mark.parametrize("payload", PYJWT_PAYLOADS)
+def test_encode_matches_pyjwt(algorithm, payload):
+    pyjwt = pytest.importorskip("jwt")
+    assert HMACSigner(KEY, algorithm).encode(payload) == pyjwt.encode(payload, KEY, algorithm=algorithm)
+
+@pytest.mark.parametrize("algorithm", ["HS256", "HS384", "HS512"])
+@pytest.mark.parametrize("payload", PYJWT_PAYLOADS)
+def test_decode_interoperates_with_pyjwt(monkeypatch, algorithm, payload):
+    pyjwt = pytest.importorskip("jwt")
+    # PyJWT reads the clock through datetime, so run both against the real time
+    monkeypatch.undo()
+    payload = {k: v for k, v in payload.items() if k not in ("exp", "nbf", "iat")}
+    signer = HMACSigner(KEY, algorithm)
+
+    assert signer.decode(pyjwt.encode(payload, KEY, algorithm=algorithm)) == payload
+    assert pyjwt.decode(signer.encode(payload), KEY, algorithms=[algorithm]) == payload
+
+@pytest.mark.parametrize("algorithm", ["HS256", "HS384", "HS512"])
+def test_signature_rejected_like_pyjwt(algorithm):
+    pyjwt = pytest.importorskip("jwt")
+    token = HMACSigner("another-key-that-is-at-least-64-bytes-long-for-hs512-signing!!!", algorithm).encode(
+        {"sub": "user@example.com"}
+    )
+    with pytest.raises(pyjwt.InvalidSignatureError):
+        pyjwt.decode(token, KEY, algorithms=[algorithm])
+    with pytest.raises(JWTError, match="Signature verification failed"):
+        HMACSigner(KEY, algorithm).decode(token)
@@ -0,0 +1,390 @@
+# tests/test_middleware.py
+import asyncio
+import re
+
+import pytest
+from starlette.applications import Starlette
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from backend.middleware import HealthCheckMiddleware, MaxBodySizeMiddleware, TrustedHostMiddleware
+from config import _host_suffixes, _origin_regex, _split_patterns
+
+def homepage(request):
+    return PlainTextResponse("OK")
+
+# A response object is itself an ASGI app, handy for raw scope tests
+ok_app = PlainTextResponse("OK")
+
+def host_client(allowed_hosts, base_url="http://testserver", **kwargs):
+    exact, wildcards = _split_patterns(allowed_hosts)
+    app = Starlette(routes=[Route("/", homepage)])
+    app.add_middleware(
+        TrustedHostMiddleware,
+        allowed_hosts=exact,
+        allowed_host_suffixes=_host_suffixes(wildcards),
+        **kwargs
+    )
+    return TestClient(app, base_url=base_url)
+
+def call(app, scope):
+    """Run a raw ASGI call and return the messages sent"""
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return sent
+
+# TrustedHostMiddleware
+
+@pytest.mark.parametrize("host, allowed", [
+    ("localhost", True),
+    ("127.0.0.1", True),
+    ("evil.com", False),
+    ("localhost.evil.com", False),
+    ("127.0.0.10", False),
+])
+def test_exact_host_match(host, allowed):
+    response = host_client(["localhost", "127.0.0.1"], base_url=f"http://{host}").get("/")
+    assert response.status_code == (200 if allowed else 400)
+    if not allowed:
+        assert response.text == "Invalid host header"
+
+@pytest.mark.parametrize("host, allowed", [
+    ("api.example.com", True),
+    ("a.b.example.com", True),
+    ("example.com", False),
+    ("evilexample.com", False),
+    ("example.com.evil.com", False),
+])
+def test_wildcard_subdomain(host, allowed):
+    response = host_client(["*.example.com"], base_url=f"http://{host}").get("/")
+    assert response.status_code == (200 if allowed else 400)
+
+@pytest.mark.parametrize("base_url", ["http://localhost:8000", "http://api.example.com:8443"])
+def test_port_stripped(base_url):
+    assert host_client(["localhost", "*.example.com"], base_url=base_url).get("/").status_code == 200
+
+def test_missing_host_header():
+    app = TrustedHostMiddleware(ok_app, allowed_hosts={"localhost"})
+    sent = call(app, {"type": "http", "method": "GET", "path": "/", "headers": []})
+    assert sent[0]["status"] == 400
+
+@pytest.mark.parametrize("base_url, location", [
+    ("http://example.com", "http://www.example.com/?q=1"),
+    ("http://example.com:8000", "http://www.example.com:8000/?q=1"),
+])
+def test_www_redirect(base_url, location):
+    response = host_client(["www.example.com"], base_url=base_url).get("/?q=1", follow_redirects=False)
+    assert response.status_code == 307
+    assert response.headers["location"] == location
+
+def test_www_redirect_disabled():
+    client = host_client(["www.example.com"], base_url="http://example.com", www_redirect=False)
+    assert client.get("/", follow_redirects=False).status_code == 400
+
+def test_www_redirect_not_for_wildcards():
+    # Same as Starlette: only exact "www." entries redirect
+    client = host_client(["*.example.com"], base_url="http://example.com")
+    assert client.get("/", follow_redirects=False).status_code == 400
+
+def test_allow_any():
+    assert host_client(["*"], base_url="http://anything.invalid").get("/").status_code == 200
+    app = TrustedHostMiddleware(ok_app, allowed_hosts={"*"})
+    sent = call(app, {"type": "http", "method": "GET", "path": "/", "headers": []})
+    assert sent[0]["status"] == 200
+
+@pytest.mark.parametrize("scope_type", ["lifespan", "custom"])
+def test_non_http_scope_passed_through(scope_type):
+    calls = []
+
+    async def inner(scope, receive, send):
+        calls.append(scope["type"])
+
+    app = TrustedHostMiddleware(inner, allowed_hosts={"localhost"})
+    assert call(app, {"type": scope_type}) == []
+    assert calls == [scope_type]
+
+def test_websocket_scope_checked():
+    calls = []
+
+    async def inner(scope, receive, send):
+        calls.append(scope["type"])
+
+    app = TrustedHostMiddleware(inner, allowed_hosts={"localhost"})
+    call(app, {"type": "websocket", "path": "/", "headers": [(b"host", b"localhost")]})
+    assert calls == ["websocket"]
+
+# ALLOWED_HOSTS / ALLOWED_ORIGINS parsing
+
+def test_split_patterns():
+    exact, wildcards = _split_patterns(" localhost, ,*.example.com,*,127.0.0.1 ".split(","))
+    assert exact == {"localhost", "*", "127.0.0.1"}
+    assert wildcards == ("*.example.com",)
+
+def test_host_suffixes():
+    assert _host_suffixes(["*.example.com", "*.a.b.org"]) == (".example.com", ".a.b.org")
+
+@pytest.mark.parametrize("pattern", ["*example.com", "example.*", "*.*.example.com", "api.*.com", "**.example.com"])
+def test_invalid_host_pattern(pattern):
+    with pytest.raises(ValueError, match="Invalid ALLOWED_HOSTS pattern"):
+        _host_suffixes([pattern])
+
+def test_no_wildcard_origins():
+    assert _origin_regex([]) is None
+
+@pytest.mark.parametrize("origin, allowed", [
+    ("https://app.example.com", True),
+    ("https://a-b.example.com", True),
+    ("http://staging.test.org:8080", True),
+    ("https://example.com", False),
+    ("http://app.example.com", False),
+    ("https://app.example.com.evil.com", False),
+    ("https://evil.com/.example.com", False),
+    ("https://app.example.com/path", False),
+    ("xhttps://app.example.com", False),
+    ("http://staging.test.org", False),
+])
+def test_origin_regex_fullmatch(origin, allowed):
+    regex = re.compile(_origin_regex(["https://*.example.com", "http://*.test.org:8080"]))
+    assert bool(regex.fullmatch(origin)) is allowed
+
+@pytest.mark.parametrize("origin, allowed", [
+    ("https://app.example.com", True),
+    ("https://app.example.com.evil.com", False),
+])
+def test_origin_regex_with_cors_middleware(origin, allowed):
+    app = Starlette(routes=[Route("/", homepage)])
+    app.add_middleware(CORSMiddleware, allow_origin_regex=_origin_regex(["https://*.example.com"]))
+    response = TestClient(app).get("/", headers={"Origin": origin})
+    assert (response.headers.get("access-control-allow-origin") == origin) is allowed
+
+def test_settings_parsed_at_import():
+    # Values come from tests/conftest.py
+    import config
+
+    assert config.ALLOWED_HOSTS == {"localhost"}
+    assert config.ALLOWED_HOST_SUFFIXES == (".example.com",)
+    assert config.ALLOWED_ORIGINS == {"http://localhost:3000"}
+    assert re.fullmatch(config.ALLOWED_ORIGIN_REGEX, "https://app.example.com")
+
+# MaxBodySizeMiddleware
+
+LIMIT = 4096
+
+def chunked_call(app, chunks, after_body=None):
+    """
+    Send a body without Content-Length as separate http.request messages.
+
+    Returns the messages sent and every message the server-side receive
+    handed out. After the body, receive returns after_body if given and
+    otherwise waits until cancelled, like a client that stays connected.
+    """
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+        for i, chunk in enumerate(chunks)
+    ]
+    received, sent = [], []
+
+    async def receive():
+        if messages:
+            message = messages.pop(0)
+        elif after_body is not None:
+            message = after_body
+        else:
+            await asyncio.Event().wait()
+        received.append(message)
+        return message
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": "/", "headers": [(b"host", b"localhost")]}
+    asyncio.run(app(scope, receive, send))
+    return sent, received
+
+def test_declared_length_over_limit():
+    calls = []
+
+    async def inner(scope, receive, send):
+        calls.append(scope)
+
+    client = TestClient(MaxBodySizeMiddleware(inner, max_body_size=LIMIT))
+    response = client.post("/", content=b"x" * (LIMIT + 1))
+    assert response.status_code == 413
+    assert response.json() == {"detail": "Request body too large"}
+    assert calls == []
+
+def test_declared_length_at_limit():
+    async def inner(scope, receive, send):
+        message = await receive()
+        await PlainTextResponse(str(len(message["body"])))(scope, receive, send)
+
+    client = TestClient(MaxBodySizeMiddleware(inner, max_body_size=LIMIT))
+    response = client.post("/", content=b"x" * LIMIT)
+    assert response.status_code == 200
+    assert response.text == str(LIMIT)
+
+@pytest.mark.parametrize("value", [b"abc", b"", b"1e3", b"12 34"])
+def test_non_numeric_content_length(value):
+    app = MaxBodySizeMiddleware(ok_app, max_body_size=LIMIT)
+    sent = call(app, {"type": "http", "method": "POST", "path": "/", "headers": [(b"content-length", value)]})
+    assert sent[0]["status"] == 400
+
+def test_chunked_over_limit_skips_app():
+    calls = []
+
+    async def inner(scope, receive, send):
+        calls.append(scope)
+
+    app = MaxBodySizeMiddleware(inner, max_body_size=LIMIT)
+    sent, received = chunked_call(app, [b"x" * 2000, b"x" * 2000, b"x" * 97, b"x" * 2000])
+    assert sent[0]["status"] == 413
+    assert calls == []
+    # Reading stops at the first chunk past the limit
+    assert len(received) == 3
+
+def test_chunked_under_limit_replayed():
+    chunks = [b"a" * 1000, b"", "héllo".encode(), b"z" * (LIMIT - 1000 - 6)]
+    seen = []
+
+    async def inner(scope, receive, send):
+        while True:
+            message = await receive()
+            seen.append(message)
+            if not message.get("more_body", False):
+                break
+        seen.append(await receive())
+        await ok_app(scope, receive, send)
+
+    app = MaxBodySizeMiddleware(inner, max_body_size=LIMIT)
+    disconnect = {"type": "http.disconnect"}
+    sent, received = chunked_call(app, chunks, after_body=disconnect)
+
+    assert sent[0]["status"] == 200
+    assert b"".join(m["body"] for m in seen[:-1]) == b"".join(chunks)
+    assert [m["more_body"] for m in seen[:-1]] == [True, True, True, False]
+    # Once the buffered body is used up, receive falls through to the server
+    assert seen[-1] == disconnect
+    assert received[-1] == disconnect
+
+def test_chunked_disconnect_while_buffering():
+    seen = []
+
+    async def inner(scope, receive, send):
+        seen.append(await receive())
+        seen.append(await receive())
+
+    messages = [{"type": "http.request", "body": b"x", "more_body": True}, {"type": "http.disconnect"}]
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "POST", "path": "/", "headers": []}
+    asyncio.run(MaxBodySizeMiddleware(inner, max_body_size=LIMIT)(scope, receive, send))
+    assert [m["type"] for m in seen] == ["http.request", "http.disconnect"]
+
+def test_chunked_body_with_streaming_response():
+    # StreamingResponse listens for http.disconnect on receive while it
+    # streams, so the replayed receive has to hand over to the server's
+    async def echo(request):
+        body = await request.body()
+
+        async def chunks():
+            yield body[:10]
+            yield body[10:]
+
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    app = MaxBodySizeMiddleware(Starlette(routes=[Route("/", echo, methods=["POST"])]), max_body_size=LIMIT)
+    chunks = [b"0123456789" * 50, b"abc" * 100]
+    sent, received = chunked_call(app, chunks)
+
+    assert sent[0]["status"] == 200
+    assert b"".join(m.get("body", b"") for m in sent[1:]) == b"".join(chunks)
+    assert len(received) == len(chunks)
+
+def test_non_http_scope_skips_body_check():
+    calls = []
+
+    async def inner(scope, receive, send):
+        calls.append(scope["type"])
+
+    assert call(MaxBodySizeMiddleware(inner, max_body_size=0), {"type": "lifespan"}) == []
+    assert calls == ["lifespan"]
+
+@pytest.mark.parametrize("headers", [{}, {"Content-Type": "application/json"}])
+def test_too_large_response_has_cors_headers(headers):
+    # The app's middleware order puts CORS outside the body size check
+    from main import app
+
+    client = TestClient(app, base_url="http://localhost")
+    response = client.post(
+        "/auth/token",
+        content=b"x" * (LIMIT + 1),
+        headers={"Origin": "http://localhost:3000", **headers}
+    )
+    assert response.status_code == 413
+    assert response.headers["access-control-allow-origin"] == "http://localhost:3000"
+
+def test_chunked_too_large_response_has_cors_headers():
+    from main import app
+
+    def body():
+        for _ in range(5):
+            yield b"x" * 1000
+
+    client = TestClient(app, base_url="http://localhost")
+    response = client.post("/auth/token", content=body(), headers={"Origin": "https://app.example.com"})
+    assert response.status_code == 413
+    assert response.headers["access-control-allow-origin"] == "https://app.example.com"
+
+# HealthCheckMiddleware
+
+@pytest.mark.parametrize("base_url", ["http://localhost", "http://evil.com", "http://10.0.0.7:8000"])
+def test_health_get_bypasses_host_check(base_url):
+    from main import app
+
+    response = TestClient(app, base_url=base_url).get("/health")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == {"status": "healthy"}
+
+def test_health_head():
+    from main import app
+
+    response = TestClient(app, base_url="http://evil.com").head("/health")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.headers["content-length"] == str(len(b'{"status":"healthy"}'))
+    assert response.content == b""
+
+def test_health_other_methods_reach_app():
+    from main import app
+
+    # Not answered by the middleware, so the host check still applies
+    assert TestClient(app, base_url="http://evil.com").post("/health").status_code == 400
+    assert TestClient(app, base_url="http://localhost").post("/health").status_code == 404
+
+def test_health_only_exact_path():
+    calls = []
+
+    async def inner(scope, receive, send):
+        calls.append(scope["path"])
+        await ok_app(scope, receive, send)
+
+    client = TestClient(HealthCheckMiddleware(inner, path="/health"))
+    assert client.get("/health").json() == {"status": "healthy"}
+    assert client.get("/health/").text == "OK"
+    assert client.get("/healthz").text == "OK"
+    assert calls == ["/health/", "/healthz"]